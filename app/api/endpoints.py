@@ -1,19 +1,32 @@
+import asyncio
+import base64
+import enum
+import hashlib
+import mimetypes
 import os
-import uuid
+import random
+import secrets
+import time
 import logging
 from datetime import datetime
-from io import BytesIO
 from typing import Optional
-from fastapi import APIRouter, UploadFile, File, Form, Depends, HTTPException, Query
-from fastapi.responses import JSONResponse, FileResponse
-from PIL import Image
-from sqlalchemy.orm import Session
+
+import aiofiles
+import orjson
+from fastapi import APIRouter, Request, UploadFile, File, Form, Depends, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, Response
+
+from app.api.schemas import ApiResponse, ChatReply, PreviewAngle, PreviewReport
+from app.utils.orjson_response import ORJSONResponse
+from sqlalchemy import bindparam, select, func, text, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.config import settings
+from app.core.redis_client import redis_client
 from app.db.session import get_db
-from app.db.models import DesignTask, DesignStatus
-from app.service.tasks import process_design_task
-from app.service.ai_services import QianwenService
+from app.db.models import DesignTask, DesignStatus, Product
+from app.service.tasks import process_design_task, _compress_reference_image
 
 # 配置日志
 logger = logging.getLogger("fashion_ai.endpoints")
@@ -22,9 +35,23 @@ logger.setLevel(logging.INFO)
 router = APIRouter()
 
 # 允许的文件类型和大小限制（从配置读取）
-ALLOWED_CONTENT_TYPES = ["image/jpeg", "image/png"]
+ALLOWED_CONTENT_TYPES = frozenset(("image/jpeg", "image/png"))
 MAX_FILE_SIZE_MB = settings.MAX_FILE_SIZE // 1024 // 1024
 
+# 上传目录预先拼成带斜杠的字符串，热路径上字符串相加即可，免去os.path.join解析
+_UPLOAD_ROOT = str(settings.UPLOAD_DIR).rstrip("/") + "/"
+
+# 错误提示在导入时格式化好，热路径上不再重建f-string
+_ERR_BAD_TYPE = f"文件类型不支持，仅允许: {sorted(ALLOWED_CONTENT_TYPES)}"
+_ERR_TOO_BIG = f"文件大小超过限制（最大{MAX_FILE_SIZE_MB}MB）"
+
+
+def _json_default(obj):
+    """orjson序列化兜底：枚举取value，其余未知类型转字符串"""
+    if isinstance(obj, enum.Enum):
+        return obj.value
+    return str(obj)
+
 # Mock数据（使用在线图片确保可访问）
 MOCK_PRODUCTS = [
     {
@@ -108,51 +135,176 @@ MOCK_INSPIRATIONS = [
 ]
 
 
+# 模拟AI回复模板（可替换为真实AI服务）：导入时建好，每次请求只format选中的一条
+_CHAT_TEMPLATES = (
+    "收到您的设计需求：'{m}'。我正在分析您的风格偏好...",
+    "基于'{m}'，我推荐使用中性色调和简约剪裁。",
+    "您的创意'{m}'很有特色！建议搭配天然材质提升舒适度。",
+    "关于'{m}'，考虑加入功能性设计元素提升实用性。"
+)
+
+# 常量接口的缓存策略：客户端可缓存5分钟，过期后60秒内可先用旧值再后台刷新
+_CACHE_CONTROL = "public, max-age=300, stale-while-revalidate=60"
+
+
+def _static_payload(data):
+    """导入时把常量数据预编码成bytes并计算ETag（blake2b-64bit足够做指纹）"""
+    body = orjson.dumps({"code": 200, "message": "success", "data": data})
+    etag = '"' + hashlib.blake2b(body, digest_size=8).hexdigest() + '"'
+    return body, etag
+
+
+def _cached_response(request: Request, body: bytes, etag: str) -> Response:
+    """带ETag协商的常量响应：命中If-None-Match时只回304空体"""
+    headers = {"ETag": etag, "Cache-Control": _CACHE_CONTROL}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
+
+
+_VARIANTS_BYTES, _VARIANTS_ETAG = _static_payload(MOCK_VARIANTS)
+_INSPIRATIONS_BYTES, _INSPIRATIONS_ETAG = _static_payload(MOCK_INSPIRATIONS)
+_HEAT_SCORE_BYTES, _HEAT_SCORE_ETAG = _static_payload({"score": 225})  # 模拟热度分数
+
+
+# 模块级预构建语句：热路径上只绑参数，不重复走子句构造
+_STMT_TASK_BY_ID = select(DesignTask).where(DesignTask.task_id == bindparam("tid"))
+
+# 历史列表的基础查询（列裁剪+排序），游标条件按请求追加；
+# 排序与(created_at DESC, design_id)复合索引对齐
+_HISTORY_BASE_STMT = (
+    select(
+        DesignTask.design_id,
+        DesignTask.garment_type,
+        DesignTask.description,
+        DesignTask.status,
+        DesignTask.created_at,
+        DesignTask.image_path,
+        (func.coalesce(func.length(DesignTask.spec), 0) > 0).label("has_result"),
+    )
+    .order_by(DesignTask.created_at.desc(), DesignTask.design_id.desc())
+)
+
+
 # ========== 前端需要的核心接口 ==========
 
+# 进程内一级缓存：Redis命中虽快但仍走一次网络往返，热门查询参数组合
+# （首页默认页）在本进程内直接命中bytes。TTL与Redis层一致（60秒），
+# 条目数封顶防止恶意关键词把内存撑爆
+_PRODUCTS_LOCAL_CACHE: dict = {}
+_PRODUCTS_LOCAL_MAX = 256
+_PRODUCTS_LOCAL_TTL = 60
+
+
 @router.get("/products")
 async def get_products(
         category: Optional[str] = Query(None, description="产品分类"),
         page: int = Query(1, ge=1, description="页码"),
         pageSize: int = Query(20, ge=1, le=100, description="每页数量"),
         keyword: Optional[str] = Query(None, description="搜索关键词"),
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_db)
 ):
     """获取产品列表 - 前端首页核心接口"""
     try:
-        # 过滤逻辑
-        filtered_products = MOCK_PRODUCTS
-
+        # 读多写少的首页接口：整份编码后的响应按查询参数缓存到Redis，
+        # 命中时一次GET直接返回，不再过滤+编码
+        cache_key = f"products:{category}:{keyword}:{page}:{pageSize}"
+
+        # 一级：进程内字典，零网络开销
+        now = time.monotonic()
+        if (local := _PRODUCTS_LOCAL_CACHE.get(cache_key)) is not None and local[0] > now:
+            return Response(local[1], media_type="application/json")
+
+        # 二级：Redis，多worker共享。Redis故障只当缓存未命中处理，
+        # 数据本体在SQLite里，不能让缓存层故障把整个接口打成500
+        try:
+            cached = await redis_client.get(cache_key)
+        except Exception as e:
+            logger.warning(f"Redis读取失败，回退数据库查询: {str(e)}")
+            cached = None
+        if cached is not None:
+            if len(_PRODUCTS_LOCAL_CACHE) >= _PRODUCTS_LOCAL_MAX:
+                _PRODUCTS_LOCAL_CACHE.clear()
+            _PRODUCTS_LOCAL_CACHE[cache_key] = (now + _PRODUCTS_LOCAL_TTL, cached)
+            return Response(cached, media_type="application/json")
+
+        # 过滤+分页全部下推到SQL：分类/关键词走索引过滤，
+        # offset/limit只取当前页，窗口计数同查总数。
+        # Core列选择：只取响应需要的列，跳过ORM实例构建和identity map登记
+        stmt = select(
+            Product.id,
+            Product.title,
+            Product.desc,
+            Product.palette,
+            Product.price,
+            Product.tag,
+            Product.trend,
+            Product.category,
+            Product.cover,
+            func.count().over().label("total"),
+        ).order_by(Product.id)
+
+        filters = []
         if category and category != "all":
-            filtered_products = [p for p in filtered_products if p.get("category") == category]
+            filters.append(Product.category == category)
 
         if keyword and keyword.strip():
-            keyword_lower = keyword.lower().strip()
-            filtered_products = [
-                p for p in filtered_products
-                if keyword_lower in p.get("title", "").lower()
-                   or keyword_lower in p.get("desc", "").lower()
-            ]
-
-        # 分页逻辑
-        start_idx = (page - 1) * pageSize
-        end_idx = start_idx + pageSize
-        paged_products = filtered_products[start_idx:end_idx]
-
-        return JSONResponse({
+            # search_text入库时已小写，关键词只需lower一次再做子串匹配
+            filters.append(Product.search_text.contains(keyword.strip().lower()))
+
+        if filters:
+            stmt = stmt.where(*filters)
+
+        stmt = stmt.offset((page - 1) * pageSize).limit(pageSize)
+        rows = (await db.execute(stmt)).all()
+        if rows:
+            total = rows[0].total
+        else:
+            # 翻页超出末尾时窗口计数没有行可附着，补一次同条件的COUNT，
+            # 保证total仍是真实的过滤后总数而不是0
+            count_stmt = select(func.count()).select_from(Product)
+            if filters:
+                count_stmt = count_stmt.where(*filters)
+            total = await db.scalar(count_stmt) or 0
+
+        paged_products = [
+            {
+                "id": r.id,
+                "title": r.title,
+                "desc": r.desc,
+                "palette": r.palette,
+                "price": r.price,
+                "tag": r.tag,
+                "trend": r.trend,
+                "category": r.category,
+                "cover": r.cover
+            }
+            for r in rows
+        ]
+
+        body = orjson.dumps({
             "code": 200,
             "message": "success",
             "data": {
                 "products": paged_products,
-                "total": len(filtered_products),
+                "total": total,
                 "page": page,
                 "pageSize": pageSize
             }
         })
+        # 短TTL：商品数据变更后最多60秒内自然失效，管理端修改时可按products:*删除
+        try:
+            await redis_client.setex(cache_key, 60, body)
+        except Exception as e:
+            logger.warning(f"Redis写入失败: {str(e)}")
+        if len(_PRODUCTS_LOCAL_CACHE) >= _PRODUCTS_LOCAL_MAX:
+            _PRODUCTS_LOCAL_CACHE.clear()
+        _PRODUCTS_LOCAL_CACHE[cache_key] = (now + _PRODUCTS_LOCAL_TTL, body)
+        return Response(body, media_type="application/json")
 
     except Exception as e:
         logger.error(f"获取产品列表失败: {str(e)}")
-        return JSONResponse({
+        return ORJSONResponse({
             "code": 500,
             "message": "获取产品列表失败",
             "data": None
@@ -160,106 +312,60 @@ async def get_products(
 
 
 @router.get("/products/heat-score")
-async def get_heat_score(db: Session = Depends(get_db)):
-    """获取热度分数 - 前端首页需要"""
-    try:
-        return JSONResponse({
-            "code": 200,
-            "message": "success",
-            "data": {
-                "score": 225  # 模拟热度分数
-            }
-        })
-    except Exception as e:
-        logger.error(f"获取热度分数失败: {str(e)}")
-        return JSONResponse({
-            "code": 500,
-            "message": "获取热度分数失败",
-            "data": None
-        })
+async def get_heat_score(request: Request):
+    """获取热度分数 - 前端首页需要（常量响应，支持ETag协商缓存）"""
+    return _cached_response(request, _HEAT_SCORE_BYTES, _HEAT_SCORE_ETAG)
 
 
 @router.get("/preview/variants")
-async def get_preview_variants(db: Session = Depends(get_db)):
-    """获取3D预览变体列表 - 前端首页需要"""
-    try:
-        return JSONResponse({
-            "code": 200,
-            "message": "success",
-            "data": MOCK_VARIANTS
-        })
-    except Exception as e:
-        logger.error(f"获取变体列表失败: {str(e)}")
-        return JSONResponse({
-            "code": 500,
-            "message": "获取变体列表失败",
-            "data": None
-        })
+async def get_preview_variants(request: Request):
+    """获取3D预览变体列表 - 前端首页需要（常量响应，支持ETag协商缓存）"""
+    return _cached_response(request, _VARIANTS_BYTES, _VARIANTS_ETAG)
 
 
 @router.get("/inspirations")
-async def get_inspirations(db: Session = Depends(get_db)):
-    """获取灵感列表 - 前端首页需要"""
-    try:
-        return JSONResponse({
-            "code": 200,
-            "message": "success",
-            "data": MOCK_INSPIRATIONS
-        })
-    except Exception as e:
-        logger.error(f"获取灵感列表失败: {str(e)}")
-        return JSONResponse({
-            "code": 500,
-            "message": "获取灵感列表失败",
-            "data": None
-        })
+async def get_inspirations(request: Request):
+    """获取灵感列表 - 前端首页需要（常量响应，支持ETag协商缓存）"""
+    return _cached_response(request, _INSPIRATIONS_BYTES, _INSPIRATIONS_ETAG)
 
 
-@router.post("/ai/chat")
-async def ai_chat(request_data: dict, db: Session = Depends(get_db)):
+@router.post("/ai/chat", response_model=ApiResponse[ChatReply])
+async def ai_chat(request_data: dict, db: AsyncSession = Depends(get_db)):
     """AI聊天接口 - 前端AI对话功能需要"""
     try:
         message = request_data.get("message", "")
         conversation_id = request_data.get("conversation_id", "")
 
-        # 模拟AI回复（可替换为真实AI服务）
-        responses = [
-            f"收到您的设计需求：'{message}'。我正在分析您的风格偏好...",
-            f"基于'{message}'，我推荐使用中性色调和简约剪裁。",
-            f"您的创意'{message}'很有特色！建议搭配天然材质提升舒适度。",
-            f"关于'{message}'，考虑加入功能性设计元素提升实用性。"
-        ]
+        # randrange比choice少一层序列协议调用，只格式化选中的那条模板
+        ai_response = _CHAT_TEMPLATES[random.randrange(len(_CHAT_TEMPLATES))].format(m=message)
 
-        import random
-        ai_response = random.choice(responses)
-
-        return JSONResponse({
-            "code": 200,
-            "message": "success",
-            "data": {
-                "message": ai_response,
-                "conversation_id": conversation_id or f"conv_{uuid.uuid4().hex[:8]}"
-            }
-        })
+        return ApiResponse(data=ChatReply(
+            message=ai_response,
+            conversation_id=conversation_id or "conv_" + secrets.token_urlsafe(6)
+        ))
 
     except Exception as e:
         logger.error(f"AI聊天失败: {str(e)}")
-        return JSONResponse({
-            "code": 500,
-            "message": "AI聊天服务暂时不可用",
-            "data": None
-        })
+        return ApiResponse(code=500, message="AI聊天服务暂时不可用")
 
 
 @router.get("/preview/image/{filename}")
 async def get_preview_image(filename: str):
     """获取预览图片 - 解决图片访问问题"""
     try:
-        file_path = os.path.join(settings.UPLOAD_DIR, filename)
+        file_path = _UPLOAD_ROOT + filename
         if not os.path.exists(file_path):
             # 返回默认图片或404
             raise HTTPException(status_code=404, detail="图片不存在")
 
+        if settings.SERVE_UPLOADS_VIA_NGINX:
+            # 只回一个内部跳转头，文件本体由nginx走内核sendfile直发，
+            # Python完全退出数据路径
+            return Response(headers={
+                "X-Accel-Redirect": f"/_protected_uploads/{filename}",
+                "Content-Type": mimetypes.guess_type(filename)[0] or "application/octet-stream"
+            })
+
         return FileResponse(file_path)
     except HTTPException:
         raise
@@ -275,7 +381,7 @@ async def search_products(
         keyword: str = Query(..., description="搜索关键词"),
         page: int = Query(1, ge=1),
         pageSize: int = Query(20, ge=1, le=100),
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_db)
 ):
     """搜索产品（可选接口）"""
     try:
@@ -286,50 +392,38 @@ async def search_products(
         )
     except Exception as e:
         logger.error(f"搜索产品失败: {str(e)}")
-        return JSONResponse({
+        return ORJSONResponse({
             "code": 500,
             "message": "搜索失败",
             "data": None
         })
 
 
-@router.post("/preview/angle")
+@router.post("/preview/angle", response_model=ApiResponse[PreviewAngle])
 async def update_preview_angle(request_data: dict):
     """更新预览角度（可选接口）"""
     try:
         angle = request_data.get("angle", 0)
-        return JSONResponse({
-            "code": 200,
-            "message": "角度更新成功",
-            "data": {"angle": angle}
-        })
+        return ApiResponse(message="角度更新成功", data=PreviewAngle(angle=angle))
     except Exception as e:
         logger.error(f"更新预览角度失败: {str(e)}")
-        return JSONResponse({
-            "code": 500,
-            "message": "更新失败",
-            "data": None
-        })
+        return ApiResponse(code=500, message="更新失败")
 
 
-@router.post("/preview/report")
+@router.post("/preview/report", response_model=ApiResponse[PreviewReport])
 async def generate_preview_report(request_data: dict):
     """生成预览报告（可选接口）"""
     try:
         design_id = request_data.get("design_id")
-        return JSONResponse({
-            "code": 200,
-            "message": "报告生成成功",
-            "data": {
-                "report_id": f"report_{uuid.uuid4().hex[:8]}",
-                "design_id": design_id,
-                "status": "completed",
-                "content": "这是设计分析报告内容..."
-            }
-        })
+        return ApiResponse(message="报告生成成功", data=PreviewReport(
+            report_id="report_" + secrets.token_urlsafe(6),
+            design_id=design_id,
+            status="completed",
+            content="这是设计分析报告内容..."
+        ))
     except Exception as e:
         logger.error(f"生成报告失败: {str(e)}")
-        return JSONResponse({
+        return ORJSONResponse({
             "code": 500,
             "message": "报告生成失败",
             "data": None
@@ -338,23 +432,23 @@ async def generate_preview_report(request_data: dict):
 
 # ========== 原有接口保持不变，但优化图片URL返回 ==========
 
-@router.get("/health")
-async def health_check():
-    """服务健康检查接口，返回基础配置信息"""
-    is_upload_dir_accessible = False
+def _build_health_payload() -> bytes:
+    """执行上传目录读写探测并编码健康检查响应
+
+    启动时调用一次，之后由后台任务定时刷新缓存，
+    探活请求不再每次都建目录+写测试文件。
+    """
     try:
         if not os.path.exists(settings.UPLOAD_DIR):
             os.makedirs(settings.UPLOAD_DIR)
-        # 测试写入权限
-        test_file = os.path.join(settings.UPLOAD_DIR, ".test")
-        with open(test_file, "w") as f:
-            f.write("test")
-        os.remove(test_file)
-        is_upload_dir_accessible = True
+        # os.access单次系统调用即可验证可写性，不再真写+删测试文件
+        # （NFS等慢存储上写测试文件可能是整个探活里最慢的一步）
+        is_upload_dir_accessible = os.access(settings.UPLOAD_DIR, os.W_OK)
     except Exception as e:
         logger.error(f"上传目录不可访问: {str(e)}")
+        is_upload_dir_accessible = False
 
-    return JSONResponse({
+    return orjson.dumps({
         "code": 200,
         "message": "服务正常",
         "data": {
@@ -364,7 +458,7 @@ async def health_check():
             "upload_dir_accessible": is_upload_dir_accessible,
             "file_limit": {
                 "max_size_mb": MAX_FILE_SIZE_MB,
-                "allowed_types": ALLOWED_CONTENT_TYPES
+                "allowed_types": sorted(ALLOWED_CONTENT_TYPES)
             },
             "api_endpoints": {
                 "products": "/api/v1/products",
@@ -372,37 +466,100 @@ async def health_check():
                 "design": "/api/v1/ai-design"
             }
         }
-    })
+    }, default=str)
+
+
+# 导入时探测一次作为初始值，startup后由refresh_health_loop接管
+_health_bytes = _build_health_payload()
+
+
+async def refresh_health_loop(interval: int = 30):
+    """后台定时重新探测上传目录并刷新健康检查响应缓存"""
+    global _health_bytes
+    while True:
+        await asyncio.sleep(interval)
+        _health_bytes = await run_in_threadpool(_build_health_payload)
+
+
+@router.get("/health")
+async def health_check():
+    """服务健康检查接口，返回基础配置信息（纯内存读，热路径零系统调用）"""
+    return Response(_health_bytes, media_type="application/json")
+
+
+# 探活/就绪分离（k8s惯例）：负载均衡器高频打/livez即可，零依赖零开销；
+# /readyz才真探数据库和Redis，结果缓存5秒防止探针风暴放大到依赖上
+_LIVEZ_BYTES = orjson.dumps({"status": "alive"})
+_READYZ_CACHE = {"ts": 0.0, "body": b"", "ok": True}
+
+
+@router.get("/livez")
+async def livez():
+    """存活探针：进程能应答即算活着"""
+    return Response(_LIVEZ_BYTES, media_type="application/json")
+
+
+@router.get("/readyz")
+async def readyz(db: AsyncSession = Depends(get_db)):
+    """就绪探针：检查数据库和Redis连通性，结果带5秒缓存"""
+    now = time.monotonic()
+    if now - _READYZ_CACHE["ts"] < 5:
+        return Response(
+            _READYZ_CACHE["body"], media_type="application/json",
+            status_code=200 if _READYZ_CACHE["ok"] else 503
+        )
+
+    checks = {}
+    try:
+        await db.execute(text("SELECT 1"))
+        checks["database"] = "ok"
+    except Exception as e:
+        checks["database"] = f"error: {e}"
+    try:
+        await redis_client.ping()
+        checks["redis"] = "ok"
+    except Exception as e:
+        checks["redis"] = f"error: {e}"
+
+    ok = all(v == "ok" for v in checks.values())
+    body = orjson.dumps({"status": "ready" if ok else "not_ready", "checks": checks})
+    _READYZ_CACHE.update(ts=now, body=body, ok=ok)
+    return Response(body, media_type="application/json", status_code=200 if ok else 503)
+
+
+# 元数据是纯常量，导入时一次性编码成bytes，请求时零构造零序列化
+_META_INFO_BYTES = orjson.dumps({
+    "code": 200,
+    "message": "success",
+    "data": {
+        "garment_types": [
+            {"value": "dress", "label": "连衣裙"},
+            {"value": "shirt", "label": "衬衫"},
+            {"value": "pants", "label": "裤子"},
+            {"value": "coat", "label": "外套"},
+            {"value": "tshirt", "label": "T恤"},
+            {"value": "skirt", "label": "半身裙"},
+            {"value": "jacket", "label": "夹克"}
+        ],
+        "design_status": [
+            {"value": "processing", "label": "处理中"},
+            {"value": "completed", "label": "已完成"},
+            {"value": "failed", "label": "失败"}
+        ],
+        "product_categories": [
+            {"value": "hot", "label": "热门"},
+            {"value": "new", "label": "新品"},
+            {"value": "sale", "label": "促销"}
+        ]
+    }
+})
+_META_INFO_ETAG = '"' + hashlib.blake2b(_META_INFO_BYTES, digest_size=8).hexdigest() + '"'
 
 
 @router.get("/meta-info")
-async def get_meta_info():
-    """返回前端所需的元数据（枚举值、选项等）"""
-    return JSONResponse({
-        "code": 200,
-        "message": "success",
-        "data": {
-            "garment_types": [
-                {"value": "dress", "label": "连衣裙"},
-                {"value": "shirt", "label": "衬衫"},
-                {"value": "pants", "label": "裤子"},
-                {"value": "coat", "label": "外套"},
-                {"value": "tshirt", "label": "T恤"},
-                {"value": "skirt", "label": "半身裙"},
-                {"value": "jacket", "label": "夹克"}
-            ],
-            "design_status": [
-                {"value": "processing", "label": "处理中"},
-                {"value": "completed", "label": "已完成"},
-                {"value": "failed", "label": "失败"}
-            ],
-            "product_categories": [
-                {"value": "hot", "label": "热门"},
-                {"value": "new", "label": "新品"},
-                {"value": "sale", "label": "促销"}
-            ]
-        }
-    })
+async def get_meta_info(request: Request):
+    """返回前端所需的元数据（枚举值、选项等，支持ETag协商缓存）"""
+    return _cached_response(request, _META_INFO_BYTES, _META_INFO_ETAG)
 
 
 @router.post("/ai-design")
@@ -410,45 +567,65 @@ async def create_ai_design(
         description: str = Form(..., description="设计需求描述"),
         garment_type: str = Form(..., description="服装类型"),
         model_image: UploadFile = File(..., description="参考图片"),
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_db)
 ):
     """提交AI设计任务（异步处理）"""
     try:
         # 1. 验证文件类型
         if model_image.content_type not in ALLOWED_CONTENT_TYPES:
-            raise HTTPException(
-                status_code=400,
-                detail=f"文件类型不支持，仅允许: {ALLOWED_CONTENT_TYPES}"
-            )
-
-        # 2. 验证文件大小
-        content = await model_image.read()
-        if len(content) > settings.MAX_FILE_SIZE:
-            raise HTTPException(
-                status_code=400,
-                detail=f"文件大小超过限制（最大{MAX_FILE_SIZE_MB}MB）"
-            )
-
-        # 3. 处理图片（压缩+保存）
-        design_id = f"design_{uuid.uuid4().hex[:10]}"
-        file_ext = model_image.filename.split(".")[-1].lower() if model_image.filename else "jpg"
-        filename = f"{design_id}.{file_ext}"
-        file_path = os.path.join(settings.UPLOAD_DIR, filename)
-
-        # 压缩图片（宽高不超过1024px）
-        img = Image.open(BytesIO(content))
-        max_size = (1024, 1024)
-        img.thumbnail(max_size)
-
-        # 确保保存为RGB模式
-        if img.mode != 'RGB':
-            img = img.convert('RGB')
-
-        with open(file_path, "wb") as f:
-            img.save(f, format='JPEG', quality=85)
-
-        # 4. 提交异步任务
-        task = process_design_task.delay(design_id, description, garment_type)
+            raise HTTPException(status_code=400, detail=_ERR_BAD_TYPE)
+
+        # 2. 以64KiB分块边读边写临时文件、边累计SHA-256：
+        #    每个上传的内存占用恒定一个块大小，超限立即中断并清理
+        tmp_path = f"{_UPLOAD_ROOT}.{secrets.token_hex(8)}.tmp"
+        hasher = hashlib.sha256()
+        total_size = 0
+        try:
+            async with aiofiles.open(tmp_path, "wb") as f:
+                while chunk := await model_image.read(65536):
+                    total_size += len(chunk)
+                    if total_size > settings.MAX_FILE_SIZE:
+                        raise HTTPException(status_code=413, detail=_ERR_TOO_BIG)
+                    hasher.update(chunk)
+                    await f.write(chunk)
+        except BaseException:
+            # 任何中途失败（超限、客户端断连、磁盘IO错误）都清掉临时文件，
+            # 不在UPLOAD_DIR里留孤儿.tmp
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+        content_hash = hasher.hexdigest()
+
+        # 3. 以内容哈希命名落盘
+        # token_urlsafe走C实现的os.urandom+base64，且80bit熵值避免hex[:10]截断的碰撞风险
+        design_id = "design_" + secrets.token_urlsafe(10)
+        file_ext = model_image.filename.rpartition(".")[2].lower() if model_image.filename else "jpg"
+        # 内容寻址存储：文件名取上传内容的SHA-256，同一参考图重复上传时
+        # 直接复用已有文件，省掉写盘和worker侧压缩
+        filename = f"{content_hash}.{file_ext}"
+        file_path = _UPLOAD_ROOT + filename
+
+        if os.path.exists(file_path):
+            os.unlink(tmp_path)
+        else:
+            # os.replace原子改名发布，读端不会看到半截文件
+            os.replace(tmp_path, file_path)
+
+        # 4. 提交异步任务（worker先压缩参考图，再做AI解析）
+        try:
+            task = process_design_task.delay(design_id, description, garment_type, file_path)
+        except Exception as e:
+            # 降级路径：broker不可用时仍把参考图压缩归一化（丢线程池跑，
+            # 不阻塞事件循环），任务本身无法异步执行，提示稍后重试
+            logger.error(f"任务队列不可用: {str(e)}")
+            await run_in_threadpool(_compress_reference_image, file_path)
+            return ORJSONResponse({
+                "code": 503,
+                "message": "任务队列不可用，请稍后重试",
+                "data": None
+            }, status_code=503)
 
         # 5. 记录到数据库
         new_task = DesignTask(
@@ -457,19 +634,19 @@ async def create_ai_design(
             description=description,
             garment_type=garment_type,
             image_path=file_path,
-            status=DesignStatus.PROCESSING,
-            created_at=datetime.utcnow()
+            status=DesignStatus.PROCESSING
+            # created_at由模型默认值取epoch毫秒，无需在这里构造datetime
         )
         db.add(new_task)
-        db.commit()
-        db.refresh(new_task)
+        # 不refresh：响应里用的字段全是本地赋值的，省一次回表SELECT
+        await db.commit()
 
         logger.info(f"设计任务提交成功: design_id={design_id}, task_id={task.id}")
 
         # 返回完整的图片URL
         preview_url = f"/api/v1/preview/image/{filename}"
 
-        return JSONResponse({
+        return ORJSONResponse({
             "code": 200,
             "message": "设计任务已提交，正在处理中",
             "data": {
@@ -482,14 +659,14 @@ async def create_ai_design(
 
     except HTTPException as e:
         logger.warning(f"客户端错误: {e.detail}")
-        return JSONResponse({
+        return ORJSONResponse({
             "code": e.status_code,
             "message": e.detail,
             "data": None
         })
     except Exception as e:
         logger.error(f"服务器处理失败: {str(e)}", exc_info=True)
-        return JSONResponse({
+        return ORJSONResponse({
             "code": 500,
             "message": "服务器处理失败，请稍后重试",
             "data": None
@@ -497,23 +674,46 @@ async def create_ai_design(
 
 
 @router.get("/task/{task_id}")
-async def get_task_status(task_id: str, db: Session = Depends(get_db)):
+async def get_task_status(task_id: str, db: AsyncSession = Depends(get_db)):
     """查询异步任务状态及结果"""
     try:
+        # 已完成任务的响应不会再变化：优先命中Redis缓存（微秒级），
+        # 跳过Celery结果后端和数据库查询。
+        # 处理中的响应也缓存2秒：前端1秒轮询一次，短TTL把对Celery结果
+        # 后端和数据库的查询压力至少砍半，又不会明显延迟完成通知。
+        # Redis故障只当缓存未命中，退化为直查Celery/数据库，不能打成500
+        cache_key = f"task_result:{task_id}"
+        poll_key = f"task_poll:{task_id}"
+        try:
+            if (cached := await redis_client.get(cache_key)) is not None:
+                return Response(cached, media_type="application/json")
+            if (cached := await redis_client.get(poll_key)) is not None:
+                return Response(cached, media_type="application/json")
+        except Exception as e:
+            logger.warning(f"Redis读取失败，回退直查任务状态: {str(e)}")
+
         # 查询Celery任务状态
         task = process_design_task.AsyncResult(task_id)
 
         # 从数据库获取设计任务信息
-        design_task = db.query(DesignTask).filter(DesignTask.task_id == task_id).first()
+        design_task = await db.scalar(_STMT_TASK_BY_ID, {"tid": task_id})
         if not design_task:
             raise HTTPException(status_code=404, detail="任务不存在")
 
         if task.ready():
             if task.successful():
-                design_task.status = DesignStatus.COMPLETED
-                design_task.spec = task.result
-                db.commit()
-                return JSONResponse({
+                # 仅在状态跃迁时落库：轮询高频命中已完成状态，重复UPDATE+commit纯属浪费
+                if design_task.status != DesignStatus.COMPLETED:
+                    await db.execute(
+                        update(DesignTask)
+                        .where(
+                            DesignTask.task_id == task_id,
+                            DesignTask.status != DesignStatus.COMPLETED
+                        )
+                        .values(status=DesignStatus.COMPLETED, spec=task.result)
+                    )
+                    await db.commit()
+                payload = orjson.dumps({
                     "code": 200,
                     "message": "任务处理完成",
                     "data": {
@@ -521,17 +721,30 @@ async def get_task_status(task_id: str, db: Session = Depends(get_db)):
                         "design_id": design_task.design_id,
                         "result": task.result
                     }
-                })
+                }, default=str)
+                try:
+                    await redis_client.set(cache_key, payload, ex=3600)
+                except Exception as e:
+                    logger.warning(f"Redis写入失败: {str(e)}")
+                return Response(payload, media_type="application/json")
             else:
-                design_task.status = DesignStatus.FAILED
-                db.commit()
-                return JSONResponse({
+                if design_task.status != DesignStatus.FAILED:
+                    await db.execute(
+                        update(DesignTask)
+                        .where(
+                            DesignTask.task_id == task_id,
+                            DesignTask.status != DesignStatus.FAILED
+                        )
+                        .values(status=DesignStatus.FAILED)
+                    )
+                    await db.commit()
+                return ORJSONResponse({
                     "code": 500,
                     "message": "任务处理失败",
                     "data": {"status": "failed", "design_id": design_task.design_id}
                 })
         else:
-            return JSONResponse({
+            payload = orjson.dumps({
                 "code": 200,
                 "message": "任务处理中",
                 "data": {
@@ -539,16 +752,21 @@ async def get_task_status(task_id: str, db: Session = Depends(get_db)):
                     "design_id": design_task.design_id
                 }
             })
+            try:
+                await redis_client.set(poll_key, payload, ex=2)
+            except Exception as e:
+                logger.warning(f"Redis写入失败: {str(e)}")
+            return Response(payload, media_type="application/json")
 
     except HTTPException as e:
-        return JSONResponse({
+        return ORJSONResponse({
             "code": e.status_code,
             "message": e.detail,
             "data": None
         })
     except Exception as e:
         logger.error(f"查询任务状态失败: {str(e)}")
-        return JSONResponse({
+        return ORJSONResponse({
             "code": 500,
             "message": "查询任务状态失败",
             "data": None
@@ -557,52 +775,80 @@ async def get_task_status(task_id: str, db: Session = Depends(get_db)):
 
 @router.get("/designs")
 async def get_design_history(
-        page: int = 1,
-        page_size: int = 10,
-        db: Session = Depends(get_db)
+        cursor: Optional[str] = Query(None, description="上一页返回的next_cursor，不传表示第一页"),
+        page_size: int = Query(10, ge=1, le=100),
+        db: AsyncSession = Depends(get_db)
 ):
-    """查询设计历史记录（分页）"""
+    """查询设计历史记录（游标分页）"""
     try:
-        if page < 1:
-            page = 1
-        offset = (page - 1) * page_size
+        # keyset分页：按(created_at, design_id)游标定位，任何页深都只扫page_size行，
+        # 不再有OFFSET逐行丢弃，也不再做昂贵的全表count
+        stmt = _HISTORY_BASE_STMT.limit(page_size + 1)
+        if cursor:
+            try:
+                raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+                ts_str, _, cursor_id = raw.partition("|")
+                cursor_ts = int(ts_str)  # epoch毫秒，游标比较是整数比较
+            except (ValueError, UnicodeDecodeError):
+                raise HTTPException(status_code=400, detail="无效的分页游标")
+            stmt = stmt.where(
+                tuple_(DesignTask.created_at, DesignTask.design_id) < (cursor_ts, cursor_id)
+            )
 
-        # 查询分页数据
-        query = db.query(DesignTask).order_by(DesignTask.created_at.desc())
-        total = query.count()
-        tasks = query.offset(offset).limit(page_size).all()
+        rows = (await db.execute(stmt)).all()
+        # 多取一行用于判断是否还有下一页
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
 
-        # 格式化返回数据
+        # 格式化返回数据（枚举/时间交给orjson原生编码，不在Python层逐行转换）
         items = []
-        for task in tasks:
-            img_filename = os.path.basename(task.image_path)
+        for row in rows:
+            # rsplit是纯C字符串操作，省掉os.path.basename的posixpath解析
+            img_filename = row.image_path.rsplit("/", 1)[-1]
             items.append({
-                "design_id": task.design_id,
-                "garment_type": task.garment_type,
-                "description": task.description,
-                "status": task.status.value,
-                "created_at": task.created_at.isoformat(),
+                "design_id": row.design_id,
+                "garment_type": row.garment_type,
+                "description": row.description,
+                "status": row.status,
+                # 只在出口处转ISO字符串，库内全程保持整数
+                "created_at": datetime.utcfromtimestamp(row.created_at / 1000).isoformat(),
                 "preview_url": f"/api/v1/preview/image/{img_filename}",  # 使用API路径
-                "has_result": bool(task.spec)
+                "has_result": bool(row.has_result)
             })
 
-        return JSONResponse({
+        next_cursor = None
+        if has_more and rows:
+            last = rows[-1]
+            next_cursor = base64.urlsafe_b64encode(
+                f"{last.created_at}|{last.design_id}".encode()
+            ).decode()
+
+        # 直接返回预编码bytes，绕开FastAPI的jsonable_encoder整树遍历
+        body = orjson.dumps({
             "code": 200,
             "message": "success",
             "data": {
                 "items": items,
                 "pagination": {
-                    "total": total,
-                    "page": page,
                     "page_size": page_size,
-                    "total_pages": (total + page_size - 1) // page_size
+                    "next_cursor": next_cursor,
+                    "has_more": has_more
                 }
             }
-        })
+        }, default=_json_default)
+        return Response(body, media_type="application/json")
 
+    except HTTPException as e:
+        # 无效游标等客户端错误按原状态码返回，不落进下面的兜底500
+        logger.warning(f"客户端错误: {e.detail}")
+        return ORJSONResponse({
+            "code": e.status_code,
+            "message": e.detail,
+            "data": None
+        })
     except Exception as e:
         logger.error(f"查询设计历史失败: {str(e)}")
-        return JSONResponse({
+        return ORJSONResponse({
             "code": 500,
             "message": "查询设计历史失败",
             "data": None
@@ -0,0 +1,36 @@
+# app/api/schemas.py
+from typing import Generic, Optional, TypeVar
+
+from pydantic import BaseModel
+
+T = TypeVar("T")
+
+
+class ApiResponse(BaseModel, Generic[T]):
+    """统一响应包装：业务码+消息+数据体
+
+    声明为response_model后由pydantic-core（Rust实现）直接序列化，
+    跳过jsonable_encoder的Python层遍历。
+    """
+    code: int = 200
+    message: str = "success"
+    data: Optional[T] = None
+
+
+class ChatReply(BaseModel):
+    """AI聊天回复"""
+    message: str
+    conversation_id: str
+
+
+class PreviewAngle(BaseModel):
+    """3D预览角度"""
+    angle: float = 0
+
+
+class PreviewReport(BaseModel):
+    """设计预览报告"""
+    report_id: str
+    design_id: Optional[str] = None
+    status: str
+    content: str
@@ -9,5 +9,18 @@ celery_app = Celery(
     backend=settings.CELERY_BACKEND_URL
 )
 
+# AI设计任务耗时差异大，禁用预取避免长任务堆积在单个worker上（队头阻塞）
+# 启动worker时配合 -Ofair 使用：celery -A app.core.celery_app worker -Ofair
+celery_app.conf.worker_prefetch_multiplier = 1
+celery_app.conf.task_acks_late = True
+
+# msgpack序列化：比JSON编解码快且体积小，状态轮询每次都要反序列化任务结果
+# result_expires配合接口层1小时的Redis缓存，结果后端不用攒更久的数据
+celery_app.conf.task_serializer = "msgpack"
+celery_app.conf.result_serializer = "msgpack"
+celery_app.conf.accept_content = ["msgpack"]
+celery_app.conf.result_extended = False
+celery_app.conf.result_expires = 3600
+
 # 自动发现任务（从service/tasks.py中加载）
 celery_app.autodiscover_tasks(["app.service"])
\ No newline at end of file
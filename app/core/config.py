@@ -1,11 +1,22 @@
-import os
-from dotenv import load_dotenv
-from pathlib import Path  # 新增导入
+# app/core/config.py
+from functools import lru_cache
+from pathlib import Path
 
-load_dotenv()
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
+
+class Settings(BaseSettings):
+    """全局配置（唯一定义处）
+
+    frozen=True：配置导入后只读，杜绝运行期被意外改写；
+    环境变量/.env覆盖默认值的工作交给pydantic-settings，
+    不再手动load_dotenv+os.getenv逐项解析。
+    """
+    model_config = SettingsConfigDict(frozen=True, env_file=".env", extra="ignore")
 
-class Settings:
     PROJECT_NAME: str = "服装定制AI平台"
+    # 置false切到生产运行模式：uvloop事件循环+多worker，关闭热重载
+    DEBUG: bool = True
     VERSION: str = "1.0.0"
     API_V1_STR: str = "/api"
 
@@ -14,8 +25,25 @@ class Settings:
     UPLOAD_DIR: Path = ROOT_DIR / "uploads"  # 绝对路径
     MAX_FILE_SIZE: int = 10 * 1024 * 1024  # 10MB
 
-    CELERY_BROKER_URL = "redis://localhost:6379/0"  # Redis地址（确保Redis已启动）
-    CELERY_BACKEND_URL = "redis://localhost:6379/0"
-    DATABASE_URL = "sqlite:///./fashion.db"  # 数据库URL（根据实际数据库调整）
+    # 生产环境置true：预览图由nginx的internal location走内核sendfile直发，
+    # 需配置 location /_protected_uploads/ { internal; alias <UPLOAD_DIR>/; sendfile on; }
+    SERVE_UPLOADS_VIA_NGINX: bool = False
+
+    # worker子进程启动时加载并预热AI模型（CPU小内存机器可关掉改为首任务惰性加载）
+    AI_WARMUP_ON_START: bool = True
+    # CPU部署置true：prefork父进程先加载模型，子进程fork后共享权重内存
+    AI_PRELOAD_BEFORE_FORK: bool = False
+
+    CELERY_BROKER_URL: str = "redis://localhost:6379/0"  # Redis地址（确保Redis已启动）
+    CELERY_BACKEND_URL: str = "redis://localhost:6379/0"
+    REDIS_URL: str = "redis://localhost:6379/0"  # 接口层缓存用，与Celery共用实例
+    DATABASE_URL: str = "sqlite+aiosqlite:///./fashion.db"  # 数据库URL（异步驱动，根据实际数据库调整）
+
+
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """进程内单例：.env只在首次调用时解析一次"""
+    return Settings()
+
 
-settings = Settings()
\ No newline at end of file
+settings = get_settings()
@@ -0,0 +1,7 @@
+# app/core/redis_client.py
+from redis import asyncio as aioredis
+
+from app.core.config import settings
+
+# 全局异步Redis客户端（自带连接池），供接口层做结果缓存
+redis_client = aioredis.from_url(settings.REDIS_URL)
@@ -1,9 +1,15 @@
 # app/db/models.py
-from sqlalchemy import Column, String, JSON, DateTime, Enum
-from datetime import datetime
+import time
+
+from sqlalchemy import BigInteger, Column, Integer, String, JSON, Enum, Index
 from app.db.base import Base
 import enum
 
+
+def _epoch_ms() -> int:
+    """当前UTC时间的epoch毫秒整数（各数据库方言通用）"""
+    return int(time.time() * 1000)
+
 class DesignStatus(str, enum.Enum):
     PROCESSING = "processing"
     COMPLETED = "completed"
@@ -12,10 +18,33 @@ class DesignStatus(str, enum.Enum):
 class DesignTask(Base):
     __tablename__ = "design_tasks"
     design_id = Column(String, primary_key=True, index=True)
-    task_id = Column(String)  # Celery任务ID
+    task_id = Column(String, index=True)  # Celery任务ID，状态轮询按它过滤
     description = Column(String)
     garment_type = Column(String)
     image_path = Column(String)  # 图片存储路径
     spec = Column(JSON)  # AI生成的设计规格
     status = Column(Enum(DesignStatus), default=DesignStatus.PROCESSING)
-    created_at = Column(DateTime, default=datetime.utcnow)
\ No newline at end of file
+    # epoch毫秒整数：索引键只有8字节，游标比较是纯整数比较。
+    # 默认值在Python侧取int（比分配datetime对象便宜，且不绑死SQLite方言）。
+    # 迁移提示：从旧版DateTime列升级需要DROP/重建design_tasks表或写alembic
+    # 迁移把历史行转成epoch毫秒，否则get_design_history反序列化会报错
+    created_at = Column(BigInteger, default=_epoch_ms)
+
+    # 历史列表按创建时间倒序分页，(created_at DESC, design_id DESC)复合索引
+    # 与查询的ORDER BY方向完全一致，排序+游标定位都是纯索引范围扫描，
+    # 并列时间的次序也直接由索引给出
+    __table_args__ = (Index("ix_design_created_desc", created_at.desc(), design_id.desc()),)
+
+class Product(Base):
+    __tablename__ = "products"
+    id = Column(Integer, primary_key=True, index=True)
+    title = Column(String, index=True)
+    desc = Column(String)
+    palette = Column(String)  # 配色方案
+    price = Column(Integer)
+    tag = Column(String)
+    trend = Column(Integer)  # 热度趋势值
+    category = Column(String, index=True)  # 分类过滤走索引
+    cover = Column(String)  # 封面图URL
+    # 预先小写拼接好的title+desc：关键词过滤直接子串匹配，不再逐行lower()分配新串
+    search_text = Column(String)
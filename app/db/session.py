@@ -1,19 +1,50 @@
 # app/db/session.py
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
 from app.core.config import settings
 
-# 配置数据库连接（从settings读取配置）
-engine = create_engine(
-    settings.DATABASE_URL,  # 确保settings.py中定义了数据库URL（如"sqlite:///./fashion.db"）
-    connect_args={"check_same_thread": False}  # SQLite专用，其他数据库可删除
-)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# 配置异步数据库连接（从settings读取配置）
+# 数据库IO走异步驱动，不再阻塞事件循环；aiosqlite在独立线程执行sqlite调用
+_db_url = settings.DATABASE_URL
+# .env里常按同步驱动写URL（sqlite:///、postgresql://），统一归一到
+# 对应异步驱动，否则create_async_engine在导入期就抛InvalidRequestError
+if _db_url.startswith("sqlite://"):
+    _db_url = _db_url.replace("sqlite://", "sqlite+aiosqlite://", 1)
+elif _db_url.startswith("postgresql://"):
+    _db_url = _db_url.replace("postgresql://", "postgresql+asyncpg://", 1)
+
+if _db_url.startswith("sqlite"):
+    # SQLite开发环境：加大busy超时，连接建立时打开WAL等性能PRAGMA
+    engine = create_async_engine(
+        _db_url,
+        query_cache_size=1200,
+        connect_args={"timeout": 30},
+    )
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def _set_sqlite_pragmas(dbapi_conn, _connection_record):
+        # WAL让读写不互斥，synchronous=NORMAL在WAL下安全且大幅减少fsync
+        cursor = dbapi_conn.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.execute("PRAGMA mmap_size=268435456")
+        cursor.close()
+else:
+    # 生产数据库（如postgresql+asyncpg）：连接池调优，断连自动检测回收
+    engine = create_async_engine(
+        _db_url,
+        query_cache_size=1200,
+        pool_size=20,
+        max_overflow=40,
+        pool_pre_ping=True,
+        pool_recycle=1800,
+    )
+
+AsyncSessionLocal = async_sessionmaker(engine, expire_on_commit=False, autoflush=False)
 
 # 提供数据库会话（供接口调用）
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db():
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
\ No newline at end of file
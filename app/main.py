@@ -11,7 +11,6 @@ warnings.filterwarnings("ignore", message="None of PyTorch, TensorFlow >= 2.0, o
 
 # -------------------------- 核心依赖导入 --------------------------
 from fastapi import FastAPI
-from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.openapi.docs import (
     get_swagger_ui_html,
@@ -20,13 +19,16 @@ from fastapi.openapi.docs import (
 
 from app.api.api_v1.api import api_router
 from app.core.config import settings
+from app.utils.cors import FrozenCORSMiddleware
+from app.utils.orjson_response import ORJSONResponse
 
 # -------------------------- 初始化FastAPI --------------------------
 app = FastAPI(
     title=settings.PROJECT_NAME,
     version=settings.VERSION,
     docs_url=None,
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    default_response_class=ORJSONResponse  # orjson序列化，比stdlib json快5-6倍
 )
 
 
@@ -50,7 +52,7 @@ async def swagger_ui_redirect():
 
 # -------------------------- CORS跨域配置 --------------------------
 app.add_middleware(
-    CORSMiddleware,
+    FrozenCORSMiddleware,
     allow_origins=[
         "http://localhost:3000",
         "http://127.0.0.1:3000",
@@ -59,7 +61,8 @@ app.add_middleware(
     ],  # 明确指定前端开发服务器地址
     allow_credentials=True,
     allow_methods=["*"],
-    allow_headers=["*"],
+    # 显式列出请求头：通配符会让预检响应每次回显请求头列表重新拼串
+    allow_headers=["Content-Type", "Authorization", "X-Requested-With"],
 )
 
 # -------------------------- 目录创建和静态文件服务 --------------------------
@@ -89,6 +92,53 @@ print(f"   - 静态文件: /static -> ./static")
 app.include_router(api_router, prefix=settings.API_V1_STR)
 
 
+# -------------------------- 启动钩子：建表灌数据 + 后台健康探测 + 线程池调优 --------------------------
+@app.on_event("startup")
+async def init_db():
+    from sqlalchemy import select, func
+    from sqlalchemy.exc import IntegrityError
+    from app.api.endpoints import MOCK_PRODUCTS
+    from app.db.base import Base
+    from app.db.models import Product
+    from app.db.session import engine, AsyncSessionLocal
+
+    # 建表（已存在则跳过），首次启动时把示例商品灌入数据库
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with AsyncSessionLocal() as db:
+        if await db.scalar(select(func.count()).select_from(Product)) == 0:
+            db.add_all(
+                Product(**p, search_text=(p["title"] + " " + p["desc"]).lower())
+                for p in MOCK_PRODUCTS
+            )
+            try:
+                await db.commit()
+                print(f"✅ 示例商品已写入数据库: {len(MOCK_PRODUCTS)}条")
+            except IntegrityError:
+                # 多worker启动会并发跑到这里，先提交的写入成功，
+                # 其余worker撞主键冲突属预期，回滚继续启动即可
+                await db.rollback()
+
+
+@app.on_event("startup")
+async def start_health_refresher():
+    import asyncio
+    from app.api import endpoints
+
+    # 上传目录探测放到后台定时任务，/health请求只读缓存
+    asyncio.create_task(endpoints.refresh_health_loop())
+
+
+@app.on_event("startup")
+async def tune_thread_pool():
+    from anyio import to_thread
+
+    # AnyIO默认只有40个线程槽位，上传高峰时I/O调用会排队；放大容量
+    # （CPU密集的图片压缩已移到Celery worker执行，这里承载的主要是文件IO；
+    # 仅broker故障的降级路径会偶尔借该池压缩一次上传图）
+    to_thread.current_default_thread_limiter().total_tokens = 200
+
+
 # -------------------------- 根路径和健康检查接口 --------------------------
 @app.get("/")
 async def root():
@@ -128,10 +178,27 @@ if __name__ == "__main__":
     print(f"📁 上传目录: {settings.UPLOAD_DIR}")
     print("=" * 60)
 
-    uvicorn.run(
-        "app.main:app",
-        host="0.0.0.0",
-        port=8000,
-        reload=True,
-        log_level="info"
-    )
\ No newline at end of file
+    if settings.DEBUG:
+        # 开发模式：单worker+热重载，便于调试
+        uvicorn.run(
+            "app.main:app",
+            host="0.0.0.0",
+            port=8000,
+            reload=True,
+            http="httptools",  # 启用httptools协议，FileResponse走os.sendfile零拷贝路径
+            log_level="info"
+        )
+    else:
+        # 生产模式：uvloop（libuv事件循环）+ httptools（C解析器），
+        # 按CPU核数起worker吃满多核；SQLite引擎是每个worker进程
+        # import时各自创建的，不存在跨fork共享连接fd的问题。
+        # 挂在nginx后面时加proxy_headers=True透传真实客户端IP
+        uvicorn.run(
+            "app.main:app",
+            host="0.0.0.0",
+            port=8000,
+            loop="uvloop",
+            http="httptools",
+            workers=os.cpu_count(),
+            log_level="warning"
+        )
\ No newline at end of file
@@ -1,46 +1,329 @@
+import copy
 import json
+import re
+import threading
+
+import torch
+from pydantic import BaseModel
+from transformers import AutoModelForCausalLM, AutoTokenizer, BitsAndBytesConfig
+
+try:
+    # 可选：约束解码。logits掩码只放行符合schema的token，
+    # 生成的JSON必定可解析，不再有格式错误浪费整次生成
+    import outlines
+except ImportError:
+    outlines = None
+
+try:
+    # GPU部署的可选推理后端：PagedAttention+连续批处理+CUDA graph
+    # 开箱即得，吞吐通常是HF原生循环的数倍；未安装则自动走HF路径
+    from vllm import LLM, SamplingParams
+except ImportError:
+    LLM = None
+
+if LLM is not None:
+    # 贪心解码参数构造一次复用：结构化JSON不需要采样，
+    # 生成到闭合大括号即停，省掉后面的无效解码步
+    _GREEDY_SAMPLING = SamplingParams(
+        max_tokens=96,
+        temperature=0.0,
+        stop=["}"],
+        include_stop_str_in_output=True
+    )
+else:
+    _GREEDY_SAMPLING = None
+
+
+class DesignSpec(BaseModel):
+    """设计规格schema：约束解码按它生成，输出结构与默认值保持一致"""
+    style: str
+    colors: list
+    details: str
+
+
+# 模块级预编译：从模型输出中抓取最外层JSON块（模型偶尔在JSON前后带说明文字）
+_JSON_RE = re.compile(r"\{.*\}", re.S)
+
+# 提示词固定前缀：所有请求逐字相同，前缀部分的KV只需prefill一次。
+# 模板去掉了源码缩进——缩进空格会原样进入prompt，白白多耗几十个token
+_PROMPT_PREFIX = "请根据用户需求生成服装设计规格：\n- 用户需求："
+_SUFFIX_TEMPLATE = (
+    "{u}\n"
+    "- 服装类型：{g}\n"
+    "请返回包含风格（style）、颜色（colors，列表）、细节描述（details）的JSON格式。"
+)
 
-from transformers import AutoModelForCausalLM, AutoTokenizer, pipeline
 
 class QianwenService:
     def __init__(self):
-        self.model_name = "Qwen/Qwen1.5-7B-Chat"
-        # 加载模型和tokenizer（注意：7B模型需要足够显存，可先测试小模型如Qwen/Qwen1.5-0.5B-Chat）
-        self.tokenizer = AutoTokenizer.from_pretrained(self.model_name)
-        self.model = AutoModelForCausalLM.from_pretrained(
-            self.model_name,
-            device_map="auto"  # 自动分配设备（CPU/GPU）
-        )
-        # 创建文本生成管道
-        self.generator = pipeline(
-            "text-generation",
-            model=self.model,
-            tokenizer=self.tokenizer
+        # 0.5B足以把短中文需求解析成固定schema的JSON：单token算力约为7B的1/14，
+        # CPU上<2GB内存即可交互式运行；schema约束解码兜住了小模型的格式错误
+        self.model_name = "Qwen/Qwen1.5-0.5B-Chat"
+
+        self.llm = None
+        if LLM is not None and torch.cuda.is_available():
+            # vLLM自带tokenizer和权重管理，HF侧的model/tokenizer不再加载
+            self.llm = LLM(
+                model=self.model_name,
+                dtype="bfloat16",
+                enforce_eager=False,
+                enable_prefix_caching=True,  # 固定模板前缀的KV跨请求自动复用
+                kv_cache_dtype="fp8_e4m3"  # KV缓存FP8存储，每个解码步少读一半KV字节
+            )
+            self.tokenizer = None
+            self.model = None
+            self._json_generator = None
+            return
+
+        # 加载模型和tokenizer
+        # use_fast显式要求Rust版tokenizer：慢速Python实现可差10-50倍，
+        # 而tokenize在每次generate的关键路径上
+        self.tokenizer = AutoTokenizer.from_pretrained(self.model_name, use_fast=True)
+        # 左padding对解码友好（批内各行右端对齐）；pad缺省时复用eos
+        self.tokenizer.padding_side = "left"
+        if self.tokenizer.pad_token is None:
+            self.tokenizer.pad_token = self.tokenizer.eos_token
+        load_kwargs = {
+            "device_map": "auto",  # 自动分配设备（CPU/GPU）
+            # SDPA融合attention：QK^T、softmax、PV在一个tiled kernel里完成，
+            # 不物化n×n注意力矩阵，prefill阶段内存流量从O(n²)降为O(n)
+            "attn_implementation": "sdpa",
+        }
+        if torch.cuda.is_available():
+            # bf16：权重/激活搬运字节比fp32减半，数值范围与fp32一致
+            load_kwargs["torch_dtype"] = torch.bfloat16
+            quantized = False
+            try:
+                import bitsandbytes  # noqa: F401
+
+                # NF4 4bit量化：权重体积降到1/4。解码是显存带宽瓶颈，
+                # 每token少读的权重字节≈成比例的tok/s提升
+                load_kwargs["quantization_config"] = BitsAndBytesConfig(
+                    load_in_4bit=True,
+                    bnb_4bit_compute_dtype=torch.bfloat16,
+                    bnb_4bit_quant_type="nf4",
+                )
+                quantized = True
+            except ImportError:
+                pass
+            try:
+                # 优先FlashAttention-2，未装flash-attn wheel时退回SDPA
+                self.model = AutoModelForCausalLM.from_pretrained(
+                    self.model_name,
+                    **{**load_kwargs, "attn_implementation": "flash_attention_2"}
+                )
+            except (ImportError, ValueError):
+                self.model = AutoModelForCausalLM.from_pretrained(self.model_name, **load_kwargs)
+            if not quantized:
+                # 非量化权重才编译：reduce-overhead把固定形状的解码步收进
+                # CUDA graph tree自动捕获回放（bnb 4bit kernel与compile不兼容）。
+                # 首次generate触发编译+autotune，由worker启动预热吃掉
+                self.model.forward = torch.compile(
+                    self.model.forward, mode="reduce-overhead", dynamic=False
+                )
+        else:
+            # CPU路径：默认dtype+SDPA直接加载（量化/编译都是CUDA专属优化）
+            self.model = AutoModelForCausalLM.from_pretrained(self.model_name, **load_kwargs)
+        # 纯推理：eval关掉dropout等训练态行为
+        self.model.eval()
+        # pad id定死在生成配置里，generate不再每次推断并告警
+        self.model.generation_config.pad_token_id = self.tokenizer.pad_token_id
+        # 静态KV缓存：解码步的张量形状固定，可被CUDA graph整体捕获回放，
+        # 消除逐token数百次kernel launch的CPU侧开销（CPU推理无此收益，不启用）
+        if torch.cuda.is_available():
+            self.model.generation_config.cache_implementation = "static"
+
+        # 锁页staging缓冲：tokenize结果先写进pinned内存再非阻塞拷到GPU
+        self._pinned = (
+            torch.empty(256, dtype=torch.long, pin_memory=True)
+            if torch.cuda.is_available() else None
         )
 
+        # 固定前缀只tokenize一次；对应的KV缓存（eager路径）首个请求时prefill
+        self._prefix_ids = self.tokenizer(
+            _PROMPT_PREFIX, return_tensors="pt"
+        ).input_ids.to(self.model.device)
+        self._prefix_kv = None
+
+        # 装了outlines就启用schema约束解码；约束下输出短很多，96 token封顶足够
+        # 1.x重写后generate.json/models.Transformers都没了，先探测API再用，
+        # 新版只当没装处理（正则抽取路径兜底）
+        self._json_generator = None
+        if (
+            outlines is not None
+            and hasattr(getattr(outlines, "generate", None), "json")
+            and hasattr(getattr(outlines, "models", None), "Transformers")
+        ):
+            self._json_generator = outlines.generate.json(
+                outlines.models.Transformers(self.model, self.tokenizer),
+                DesignSpec
+            )
+
+    def _to_device(self, ids_cpu):
+        """token id经锁页缓冲staging后非阻塞拷贝到设备
+
+        pageable内存的H2D拷贝要先进驱动的内部锁页缓冲且同步返回；
+        先写入预分配的pinned张量，non_blocking拷贝就能与后续的
+        Python侧工作和首个kernel launch重叠。CPU推理直接原样返回。
+        """
+        n = ids_cpu.shape[1]
+        if self._pinned is None or n > self._pinned.shape[0]:
+            return ids_cpu.to(self.model.device, non_blocking=True)
+        self._pinned[:n].copy_(ids_cpu[0])
+        return self._pinned[:n].unsqueeze(0).to(self.model.device, non_blocking=True)
+
+    def _prefix_past(self):
+        """返回固定提示词前缀的KV缓存副本
+
+        前缀prefill只做一次；generate会原地写缓存，所以每次返回深拷贝。
+        拷贝的代价远低于对前缀重做一遍attention prefill。
+        """
+        if self._prefix_kv is None:
+            with torch.no_grad():
+                self._prefix_kv = self.model(
+                    self._prefix_ids, use_cache=True
+                ).past_key_values
+        return copy.deepcopy(self._prefix_kv)
+
+    @torch.inference_mode()
     def parse_design_request(self, user_input: str, garment_type: str) -> dict:
-        """解析用户需求，生成设计规格"""
-        prompt = f"""
-        请根据用户需求生成服装设计规格：
-        - 用户需求：{user_input}
-        - 服装类型：{garment_type}
-        请返回包含风格（style）、颜色（colors，列表）、细节描述（details）的JSON格式。
+        """解析用户需求，生成设计规格
+
+        inference_mode比no_grad更彻底：既不建autograd图，也免去
+        每个张量的版本计数维护——解码每步有数百个算子，逐op省一点积少成多。
         """
-        # 模型推理
-        response = self.generator(
-            prompt,
-            max_new_tokens=200,
-            temperature=0.7,
-            do_sample=True
-        )
-        # 解析结果（简化处理，实际需加格式校验）
-        result = response[0]["generated_text"].split(prompt)[-1].strip()
-        try:
-            return json.loads(result)
-        except json.JSONDecodeError:
-            # 若解析失败，返回默认值
-            return {
-                "style": "现代简约",
-                "colors": ["黑色", "灰色"],
-                "details": "根据需求生成的设计"
-            }
\ No newline at end of file
+        suffix = _SUFFIX_TEMPLATE.format(u=user_input, g=garment_type)
+        if self.llm is not None:
+            outputs = self.llm.generate(
+                [_PROMPT_PREFIX + suffix],
+                _GREEDY_SAMPLING
+            )
+            return self._parse_result(outputs[0].outputs[0].text.strip())
+
+        if self._json_generator is not None:
+            spec = self._json_generator(_PROMPT_PREFIX + suffix, max_tokens=96)
+            return spec.model_dump()
+
+        # 绕开pipeline直接驱动generate：少一层Python调度，
+        # 解码时只取新生成的token段，不再对"prompt+补全"整串做字符串切分
+        if self.model.generation_config.cache_implementation is None:
+            # eager路径：复用前缀KV，prefill只算每次都在变的后缀部分
+            suffix_ids = self._to_device(self.tokenizer(
+                suffix, add_special_tokens=False, return_tensors="pt"
+            ).input_ids)
+            past = self._prefix_past()
+            input_ids = torch.cat([self._prefix_ids, suffix_ids], dim=1)
+            output_ids = self.model.generate(
+                input_ids=input_ids,
+                past_key_values=past,
+                max_new_tokens=96,
+                do_sample=False,
+                stop_strings=["}"],
+                tokenizer=self.tokenizer
+            )
+        else:
+            # 静态缓存（CUDA graph）路径不接受外部past_key_values，整串prefill；
+            # 但前缀token已缓存，仍只需tokenize后缀再拼接
+            suffix_ids = self._to_device(self.tokenizer(
+                suffix, add_special_tokens=False, return_tensors="pt"
+            ).input_ids)
+            input_ids = torch.cat([self._prefix_ids, suffix_ids], dim=1)
+            output_ids = self.model.generate(
+                input_ids=input_ids,
+                max_new_tokens=96,
+                do_sample=False,
+                stop_strings=["}"],
+                tokenizer=self.tokenizer
+            )
+        result = self.tokenizer.decode(
+            output_ids[0, input_ids.shape[1]:],
+            skip_special_tokens=True
+        ).strip()
+        return self._parse_result(result)
+
+    @torch.inference_mode()
+    def parse_batch(self, requests: list) -> list:
+        """批量解析：多条(用户需求, 服装类型)合成一次generate
+
+        单条推理时GPU占用率很低，合批把逐token的kernel launch和
+        Python调度开销摊薄到整批；worker积压多个设计任务时
+        可以用它一次消化。返回顺序与入参一致。
+        """
+        prompts = [
+            _PROMPT_PREFIX + _SUFFIX_TEMPLATE.format(u=user_input, g=garment_type)
+            for user_input, garment_type in requests
+        ]
+        if self.llm is not None:
+            outputs = self.llm.generate(
+                prompts, _GREEDY_SAMPLING
+            )
+            return [self._parse_result(o.outputs[0].text.strip()) for o in outputs]
+
+        # 按token长度排序后分桶（桶内长度差≤32）：padding只补到桶内最长，
+        # 不再整批向全局最长prompt对齐，省下在pad token上白烧的prefill算力
+        lengths = [len(ids) for ids in self.tokenizer(prompts, truncation=True, max_length=256).input_ids]
+        order = sorted(range(len(prompts)), key=lengths.__getitem__)
+        results = [None] * len(prompts)
+
+        def run_bucket(bucket):
+            # 左padding在__init__统一设好，生成段统一从padded长度处切片
+            inputs = self.tokenizer(
+                [prompts[i] for i in bucket],
+                padding=True, truncation=True, max_length=256, return_tensors="pt"
+            ).to(self.model.device)
+            output_ids = self.model.generate(
+                **inputs,
+                max_new_tokens=96,
+                do_sample=False,
+                stop_strings=["}"],
+                tokenizer=self.tokenizer
+            )
+            prompt_len = inputs["input_ids"].shape[1]
+            for i, row in zip(bucket, output_ids):
+                results[i] = self._parse_result(
+                    self.tokenizer.decode(row[prompt_len:], skip_special_tokens=True).strip()
+                )
+
+        bucket = []
+        for idx in order:
+            if bucket and lengths[idx] - lengths[bucket[0]] > 32:
+                run_bucket(bucket)
+                bucket = []
+            bucket.append(idx)
+        if bucket:
+            run_bucket(bucket)
+        return results
+
+    @staticmethod
+    def _parse_result(result: str) -> dict:
+        """解析模型输出：正则定位JSON块后再loads"""
+        match = _JSON_RE.search(result)
+        if match:
+            try:
+                return json.loads(match.group())
+            except json.JSONDecodeError:
+                pass
+        # 若解析失败，返回默认值
+        return {
+            "style": "现代简约",
+            "colors": ["黑色", "灰色"],
+            "details": "根据需求生成的设计"
+        }
+
+_service: QianwenService = None
+_service_lock = threading.Lock()
+
+
+def get_qianwen_service() -> QianwenService:
+    """进程级单例：首次调用加载模型，之后直接复用
+
+    QianwenService的构造要加载模型权重，必须跨请求/跨任务复用，
+    绝不能每次调用都新建实例。双重检查加锁：lru_cache在并发
+    首调用时可能构造两份模型（显存直接翻倍），显式锁保证只建一次。
+    """
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                _service = QianwenService()
+    return _service
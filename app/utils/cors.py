@@ -0,0 +1,20 @@
+# app/utils/cors.py
+from fastapi.middleware.cors import CORSMiddleware
+
+
+class FrozenCORSMiddleware(CORSMiddleware):
+    """CORS中间件：源列表预构建为frozenset
+
+    Starlette原版is_allowed_origin对allow_origins做线性扫描，
+    每个带Origin的请求（含预检）都要比对一遍；源集合固定，
+    换成哈希查找是O(1)。
+    """
+
+    def __init__(self, app, **kwargs):
+        super().__init__(app, **kwargs)
+        self._allow_origins_set = frozenset(self.allow_origins)
+
+    def is_allowed_origin(self, origin: str) -> bool:
+        if self.allow_all_origins:
+            return True
+        return origin in self._allow_origins_set or super().is_allowed_origin(origin)
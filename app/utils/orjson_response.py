@@ -0,0 +1,17 @@
+# app/utils/orjson_response.py
+import orjson
+from fastapi.responses import JSONResponse
+
+
+class ORJSONResponse(JSONResponse):
+    """基于orjson的JSON响应类，序列化速度约为stdlib json的5-6倍"""
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        # OPT_NON_STR_KEYS: 兼容枚举/数字键; OPT_UTC_Z: datetime统一输出Z后缀
+        # default=str: 兜底处理Path等orjson不认识的类型
+        return orjson.dumps(
+            content,
+            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_UTC_Z,
+            default=str,
+        )